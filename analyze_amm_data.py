@@ -4,6 +4,8 @@ from datetime import datetime
 from collections import defaultdict
 import pandas as pd
 
+from downsample_series import downsample
+
 
 def load_data(file_path):
     """
@@ -114,10 +116,11 @@ def integrate_payment_error_ratios(payment_stats, data, start_date):
             payment_stats[record_date.date()]['tecPATH_DRY_ratio'] = 0
 
 
-def plot_error_ratios(payment_stats):
+def plot_error_ratios(payment_stats, max_points=1000):
     """
     Plot the error ratios of tecPATH_PARTIAL and tecPATH_DRY over time.
     Include both original and outlier-removed data.
+    Each line is rolled up (and LTTB-downsampled if needed) to at most `max_points` points.
     """
     # Extract data
     payment_dates = sorted(payment_stats.keys())
@@ -126,8 +129,8 @@ def plot_error_ratios(payment_stats):
 
 
     plt.figure(figsize=(10, 6))
-    plt.plot(payment_dates, partial_ratios, label='tecPATH_PARTIAL Ratio', color='red', linestyle='-')
-    plt.plot(payment_dates, dry_ratios, label='tecPATH_DRY Ratio', color='blue', linestyle='-')
+    plt.plot(*downsample(payment_dates, partial_ratios, max_points), label='tecPATH_PARTIAL Ratio', color='red', linestyle='-')
+    plt.plot(*downsample(payment_dates, dry_ratios, max_points), label='tecPATH_DRY Ratio', color='blue', linestyle='-')
 
     # Add vertical line and annotation for 2024-03-22
     marked_date = datetime.strptime("2024-03-22", "%Y-%m-%d")
@@ -148,16 +151,18 @@ def plot_error_ratios(payment_stats):
     plt.savefig('liquidity_before_and_after_AMM.png')
     plt.show()
 
-def plot_data(amm_counts, payment_stats, offercreate_stats):
+def plot_data(amm_counts, payment_stats, offercreate_stats, max_points=1000):
     """
     Plot the AMM count and transaction data with five subplots.
+    Each line is rolled up (and LTTB-downsampled if needed) to at most `max_points` points.
+    Counts are averaged, not summed, over weeks or months, so they stay on a per-day scale.
     """
     fig, axs = plt.subplots(4, 1, figsize=(10, 20))
 
     # Plot AMM Count over time
     amm_dates = [x['date'] for x in amm_counts]
     amm_values = [x['amm_count'] for x in amm_counts]
-    axs[0].plot(amm_dates, amm_values, label='AMM Count')
+    axs[0].plot(*downsample(amm_dates, amm_values, max_points), label='AMM Count')
     axs[0].set_title('AMM Count Over Time')
     axs[0].set_xlabel('Date')
     axs[0].set_ylabel('AMM Count')
@@ -173,7 +178,7 @@ def plot_data(amm_counts, payment_stats, offercreate_stats):
                                                                                                           'total']) > 0 else 0
         for d in payment_dates
     ]
-    axs[1].plot(payment_dates, payment_ratios, label='Payment Success Ratio', color='green')
+    axs[1].plot(*downsample(payment_dates, payment_ratios, max_points), label='Payment Success Ratio', color='green')
     axs[1].set_title('Payment Success Ratio Over Time')
     axs[1].set_xlabel('Date')
     axs[1].set_ylabel('Success Ratio')
@@ -182,10 +187,10 @@ def plot_data(amm_counts, payment_stats, offercreate_stats):
     # Plot OfferCreate total transactions over time
     offercreate_dates = sorted(offercreate_stats.keys())
     offercreate_totals = [offercreate_stats[d]['total'] for d in offercreate_dates]
-    axs[2].plot(offercreate_dates, offercreate_totals, label='OfferCreate Total Transactions', color='blue')
+    axs[2].plot(*downsample(offercreate_dates, offercreate_totals, max_points), label='OfferCreate Total Transactions', color='blue')
     axs[2].set_title('OfferCreate Total Transactions Over Time')
     axs[2].set_xlabel('Date')
-    axs[2].set_ylabel('Total Transactions')
+    axs[2].set_ylabel('Total Transactions per Day')
     axs[2].legend()
 
     # # Plot Payment total transactions over time
@@ -200,12 +205,12 @@ def plot_data(amm_counts, payment_stats, offercreate_stats):
     payment_totals = [payment_stats[d]['total'] for d in payment_dates]
     payment_successes = [payment_stats[d]['success'] for d in payment_dates]
 
-    axs[3].plot(payment_dates, payment_totals, label='Total Transactions', color='orange')
-    axs[3].plot(payment_dates, payment_successes, label='Successful Transactions', color='green', linestyle='--')
+    axs[3].plot(*downsample(payment_dates, payment_totals, max_points), label='Total Transactions', color='orange')
+    axs[3].plot(*downsample(payment_dates, payment_successes, max_points), label='Successful Transactions', color='green', linestyle='--')
 
     axs[3].set_title('Payment Total and Successful Transactions Over Time')
     axs[3].set_xlabel('Date')
-    axs[3].set_ylabel('Transaction Count')
+    axs[3].set_ylabel('Transaction Count per Day')
     axs[3].legend()
 
     plt.tight_layout()
@@ -10,6 +10,40 @@ def load_json(file_path):
     return data
 
 
+def payment_cost(tx):
+    """
+    Compute fee, slippage and total cost of a single Payment transaction.
+    """
+    meta = tx.get("meta", {})
+    delivered_amount = meta.get("delivered_amount", {}).get("value", 0)
+    expected_amount = tx.get("Amount", {}).get("value", 0)
+    currency = meta.get("delivered_amount", {}).get("currency", "UNKNOWN")
+    fee = float(tx.get("Fee", 0)) / 1_000_000  # Fee in XRP
+
+    if float(expected_amount) > 0:
+        slippage_cost = (float(expected_amount) - float(delivered_amount)) / float(expected_amount) * 100
+    else:
+        slippage_cost = 0  # Avoid division by zero
+
+    total_cost_currency = float(expected_amount) - float(delivered_amount) + fee
+
+    date = datetime.strptime(tx["date"], "%Y-%m-%dT%H:%M:%S.%fZ")
+
+    return {
+        "hash": tx.get("hash"),
+        "account": tx.get("Account"),
+        "destination": tx.get("Destination"),
+        "currency": currency,
+        "fee_xrp": fee,
+        "fee": int(tx.get("Fee", 0)),
+        "expected_amount": float(expected_amount),
+        "delivered_amount": float(delivered_amount),
+        "slippage_cost_pct": slippage_cost,
+        "total_cost_currency": total_cost_currency,
+        "date": date
+    }
+
+
 def process_data(data):
     transactions = []
     for account, tx_list in data.items():
@@ -17,34 +51,7 @@ def process_data(data):
             ty = tx.get("TransactionType", "UNKNOWN")
             if ty != "Payment":
                 continue
-            meta = tx.get("meta", {})
-            delivered_amount = meta.get("delivered_amount", {}).get("value", 0)
-            expected_amount = tx.get("Amount", {}).get("value", 0)
-            currency = meta.get("delivered_amount", {}).get("currency", "UNKNOWN")
-            fee = float(tx.get("Fee", 0)) / 1_000_000  # Fee in XRP
-
-            if float(expected_amount) > 0:
-                slippage_cost = (float(expected_amount) - float(delivered_amount)) / float(expected_amount) * 100
-            else:
-                slippage_cost = 0  # Avoid division by zero
-
-            total_cost_currency = float(expected_amount) - float(delivered_amount) + fee
-
-            date = datetime.strptime(tx["date"], "%Y-%m-%dT%H:%M:%S.%fZ")
-
-            transactions.append({
-                "hash": tx.get("hash"),
-                "account": tx.get("Account"),
-                "destination": tx.get("Destination"),
-                "currency": currency,
-                "fee_xrp": fee,
-                "fee": int(tx.get("Fee", 0)),
-                "expected_amount": float(expected_amount),
-                "delivered_amount": float(delivered_amount),
-                "slippage_cost_pct": slippage_cost,
-                "total_cost_currency": total_cost_currency,
-                "date": date
-            })
+            transactions.append(payment_cost(tx))
 
     return pd.DataFrame(transactions)
 
@@ -138,15 +145,98 @@ def plot_monthly_tx_count(metrics_df):
     plt.show()
 
 
+def segment_values(transactions, columns):
+    """
+    Cost columns and success flag of the sampled Payments of one segment.
+    """
+    costs = pd.DataFrame([payment_cost(tx) for tx in transactions], columns=["fee", "slippage_cost_pct",
+                                                                            "total_cost_currency"])
+    costs["success"] = [tx.get("meta", {}).get("TransactionResult") == "tesSUCCESS" for tx in transactions]
+    return costs[list(columns)].astype(float)
+
+
+def two_stage_estimate(stratum, column_values):
+    """
+    Mean per transaction of one stratum and its variance under two-stage sampling:
+    ledger segments drawn at random from the month (first stage), then a reservoir sample inside each
+    segment (second stage). The mean is a ratio estimator over segments; the variance combines the
+    between-segment term (zero when every segment was fetched) and the within-segment term, both with
+    their finite population corrections.
+    """
+    total_segments, sampled = stratum["segments_total"], stratum["segments_sampled"]
+    counts, means, within = [], [], []
+    for segment, values in zip(stratum["segments"], column_values):
+        c, n = segment["population"], len(values)
+        counts.append(c)
+        means.append(values.mean() if n else 0.0)
+        variance = values.var(ddof=1) if n > 1 else 0.0
+        within.append(c ** 2 * (1 - n / c) * variance / n if n else 0.0)
+
+    total_count = sum(counts)
+    ratio = sum(c * m for c, m in zip(counts, means)) / total_count
+    population = total_segments / sampled * total_count
+
+    between = 0.0
+    if sampled < total_segments:
+        residuals = [c * (m - ratio) for c, m in zip(counts, means)]
+        spread = sum(d ** 2 for d in residuals) / (sampled - 1) if sampled > 1 else float("nan")
+        between = total_segments ** 2 * (1 - sampled / total_segments) * spread / sampled
+    variance = (between + total_segments / sampled * sum(within)) / population ** 2
+    return ratio, variance
+
+
+def stratified_monthly_estimates(samples, columns=("fee", "slippage_cost_pct", "total_cost_currency", "success")):
+    """
+    Estimate monthly Payment means and their standard errors from stratified samples
+    produced by `collect_tx_data.sample_entity_transactions`.
+    Each stratum is estimated from its sampled ledger segments (`two_stage_estimate`), then strata of the
+    same month (one per entity) are combined with their estimated population weights.
+    Strata flagged incomplete (a segment could not be fetched entirely) are left out,
+    as their population is undercounted.
+    """
+    rows = []
+    for sample in samples:
+        for stratum in sample["strata"]:
+            if stratum["type"] != "Payment" or not stratum.get("complete", False):
+                continue
+            column_values = [segment_values(segment["transactions"], columns) for segment in stratum["segments"]]
+            row = {"month": stratum["month"], "name": sample["name"], "population": stratum["population"],
+                   "sample_size": stratum["sample_size"]}
+            for column in columns:
+                mean, variance = two_stage_estimate(stratum, [values[column] for values in column_values])
+                row[f"{column}_mean"] = mean
+                row[f"{column}_var"] = variance
+            rows.append(row)
+
+    if not rows:
+        return pd.DataFrame()
+    strata_df = pd.DataFrame(rows)
+    estimates = []
+    for month, group in strata_df.groupby("month"):
+        share = group["population"] / group["population"].sum()
+        estimate = {"month": month, "entities": len(group), "population": group["population"].sum(),
+                    "sample_size": group["sample_size"].sum()}
+        for column in columns:
+            estimate[f"avg_{column}"] = (share * group[f"{column}_mean"]).sum()
+            estimate[f"{column}_se"] = ((share ** 2) * group[f"{column}_var"]).sum() ** 0.5
+        estimates.append(estimate)
+    return pd.DataFrame(estimates)
+
+
 def filter_data_after_2021(df):
     return df[df["date"] >= datetime(2021, 1, 1)]
 
 
-raw_data = load_json("transactions/UPbit.json")
-processed_df = filter_data_after_2021(process_data(raw_data))
+def main():
+    raw_data = load_json("transactions/UPbit.json")
+    processed_df = filter_data_after_2021(process_data(raw_data))
+
+    print(processed_df.head())
+    monthly_metrics = group_by_month_and_calculate_metrics(processed_df)
+    print(monthly_metrics)
+    plot_monthly_trends(monthly_metrics)
+    plot_monthly_tx_count(monthly_metrics)
+
 
-print(processed_df.head())
-monthly_metrics = group_by_month_and_calculate_metrics(processed_df)
-print(monthly_metrics)
-plot_monthly_trends(monthly_metrics)
-plot_monthly_tx_count(monthly_metrics)
+if __name__ == "__main__":
+    main()
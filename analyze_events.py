@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from analyze_amm_data import (
+    load_data,
+    extract_tx_data_from_counts,
+    integrate_payment_success,
+    integrate_payment_error_ratios,
+)
+
+
+def to_series(metric):
+    """
+    Turn a {date: value} mapping (or a Series) into a date-indexed Series sorted by date.
+    """
+    series = metric.copy() if isinstance(metric, pd.Series) else pd.Series(metric)
+    series.index = pd.to_datetime(series.index)
+    return series.sort_index().astype(float)
+
+
+def event_windows(series, event_date, window_days=30):
+    """
+    Split the series into the `window_days` before the event and the `window_days` from the event on.
+    """
+    event = pd.Timestamp(event_date)
+    before = series[(series.index >= event - timedelta(days=window_days)) & (series.index < event)]
+    after = series[(series.index >= event) & (series.index < event + timedelta(days=window_days))]
+    return before.to_numpy(), after.to_numpy()
+
+
+def block_resample_indices(rng, n, num_resamples, block_size):
+    """
+    Moving-block bootstrap indices: each resample of length `n` is made of random runs of `block_size`
+    consecutive days, so the autocorrelation of daily series is kept within blocks.
+    """
+    block_size = max(1, min(block_size, n))
+    num_blocks = -(-n // block_size)
+    starts = rng.integers(0, n - block_size + 1, size=(num_resamples, num_blocks))
+    indices = starts[:, :, None] + np.arange(block_size)
+    return indices.reshape(num_resamples, -1)[:, :n]
+
+
+def _bootstrap_chunk(args):
+    """
+    Draw `num_resamples` bootstrap differences of means (after - before) in one vectorized step.
+    """
+    before, after, num_resamples, block_size, seed = args
+    rng = np.random.default_rng(seed)
+    before_idx = block_resample_indices(rng, len(before), num_resamples, block_size)
+    after_idx = block_resample_indices(rng, len(after), num_resamples, block_size)
+    return after[after_idx].mean(axis=1) - before[before_idx].mean(axis=1)
+
+
+def bootstrap_tasks(before, after, num_resamples, block_size, chunk_size, seed_sequence):
+    """
+    Split the resamples of one window pair into chunks of `chunk_size`, each with its own child seed.
+    """
+    num_chunks = max(1, -(-num_resamples // chunk_size))
+    seeds = seed_sequence.spawn(num_chunks)
+    sizes = [chunk_size] * (num_chunks - 1) + [num_resamples - chunk_size * (num_chunks - 1)]
+    return [(before, after, size, block_size, s) for size, s in zip(sizes, seeds)]
+
+
+def event_study(metrics, event_dates, window_days=30, num_resamples=10000, confidence=0.95, block_size=7,
+                workers=None, chunk_size=500, seed=0):
+    """
+    Compare each metric before and after each event date.
+    `metrics` maps a metric name to a {date: value} mapping or a Series.
+    Returns one row per (metric, event) with window means, the difference and its bootstrap confidence interval.
+
+    Daily metrics are autocorrelated, so the windows are resampled with a moving-block bootstrap of
+    `block_size` days (block_size=1 is the iid bootstrap, which gives too narrow intervals on such series).
+    Every (metric, event) pair gets its own seed. The chunks of all pairs are submitted to `workers`
+    processes at once (all cores by default, in-process when 1) and collected afterwards.
+    """
+    pairs = []
+    for name, metric in metrics.items():
+        series = to_series(metric)
+        for event_date in event_dates:
+            before, after = event_windows(series, event_date, window_days)
+            pairs.append((name, event_date, before, after))
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(pairs))
+
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        pending = []
+        for (name, event_date, before, after), seed_sequence in zip(pairs, seed_sequences):
+            if len(before) == 0 or len(after) == 0:
+                pending.append([])
+                continue
+            tasks = bootstrap_tasks(before, after, num_resamples, block_size, chunk_size, seed_sequence)
+            if executor is None:
+                pending.append([_bootstrap_chunk(task) for task in tasks])
+            else:
+                pending.append([executor.submit(_bootstrap_chunk, task) for task in tasks])
+
+        alpha = (1 - confidence) / 2
+        rows = []
+        for (name, event_date, before, after), chunks in zip(pairs, pending):
+            row = {
+                "metric": name,
+                "event": str(event_date),
+                "n_before": len(before),
+                "n_after": len(after),
+                "mean_before": np.nan,
+                "mean_after": np.nan,
+                "diff": np.nan,
+                "ci_low": np.nan,
+                "ci_high": np.nan,
+            }
+            if chunks:
+                diffs = np.concatenate([c if executor is None else c.result() for c in chunks])
+                row.update({
+                    "mean_before": before.mean(),
+                    "mean_after": after.mean(),
+                    "diff": after.mean() - before.mean(),
+                    "ci_low": np.quantile(diffs, alpha),
+                    "ci_high": np.quantile(diffs, 1 - alpha),
+                })
+            rows.append(row)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return pd.DataFrame(rows)
+
+
+def plot_event_study(results, filename="event_study.png"):
+    """
+    Plot the difference and confidence interval of every (metric, event) pair.
+    """
+    labels = results["metric"] + " @ " + results["event"]
+    errors = [results["diff"] - results["ci_low"], results["ci_high"] - results["diff"]]
+
+    plt.figure(figsize=(10, max(4, len(results) * 0.5)))
+    plt.errorbar(results["diff"], range(len(results)), xerr=errors, fmt="o", color="blue", capsize=4)
+    plt.axvline(0, color="grey", linestyle=":")
+    plt.yticks(range(len(results)), labels)
+    plt.title("Change After Event (mean after - mean before)")
+    plt.xlabel("Difference")
+    plt.tight_layout()
+    plt.savefig(filename)
+    plt.close()
+    print(f"Saved plot to {filename}")
+
+
+def main():
+    start_date = datetime.strptime("2023-03-22", "%Y-%m-%d")
+
+    tx_counts_data = load_data('tx_type.json')
+    payment_success_data = load_data('tx_result.json')
+    payment_stats, _ = extract_tx_data_from_counts(tx_counts_data, start_date)
+    integrate_payment_success(payment_stats, payment_success_data, start_date)
+    integrate_payment_error_ratios(payment_stats, payment_success_data, start_date)
+
+    metrics = {
+        key: {d: stats.get(key, 0) for d, stats in payment_stats.items()}
+        for key in ['tecPATH_PARTIAL_ratio', 'tecPATH_DRY_ratio']
+    }
+    # AMM launch on XRPL
+    events = ["2024-03-22"]
+
+    results = event_study(metrics, events, window_days=30)
+    print(results)
+    plot_event_study(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import json
 from collections import defaultdict
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import os
 from datetime import datetime
 
+from downsample_series import downsample
+
 
 def load_json(file_name):
     if not os.path.exists(file_name):
@@ -43,20 +46,22 @@ def calculate_percentage_trend(monthly_totals, numerator_metric, denominator_met
     return percentages
 
 
-def plot_trend(data, title, ylabel, filename, interval=3):
+def plot_trend(data, title, ylabel, filename, interval=3, max_points=500):
     months = sorted(data.keys())
     values = [data[month] for month in months]
-
-    # Adjust x-axis labels to show fewer ticks
-    x_ticks = list(range(0, len(months), interval))  # Show one tick every `interval` months
-    x_labels = [months[i] for i in x_ticks]
+    # Plot on a real date axis so that months dropped by downsampling keep their spacing
+    dates = [datetime.strptime(month, "%Y-%m") for month in months]
+    dates, values = downsample(dates, values, max_points)
 
     plt.figure(figsize=(12, 6))
-    plt.plot(months, values, marker="o", label=ylabel)
+    plt.plot(dates, values, marker="o", label=ylabel)
     plt.title(title)
     plt.xlabel("Month")
     plt.ylabel(ylabel)
-    plt.xticks(ticks=x_ticks, labels=x_labels, rotation=45)
+    # Show one tick every `interval` months
+    plt.gca().xaxis.set_major_locator(mdates.MonthLocator(interval=interval))
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
+    plt.xticks(rotation=45)
     plt.grid(True, linestyle="--", alpha=0.6)
     plt.legend()
     plt.tight_layout()
@@ -1,9 +1,13 @@
 import requests
 import json
 import os
+import random
 import time
+from collections import defaultdict
+from datetime import datetime, timezone
 
 from group_well_known_accounts import group_and_count_accounts
+from stream_tx_data import normalize_stream_tx
 
 
 # Fetch all Well-Known Accounts Data
@@ -122,6 +126,221 @@ def fetch_recent_tx_for_top_accounts(top_num=5, num_tx=10000):
         print(f"Saved transactions for {name} to {output_file}")
 
 
+# Ripple epoch (2000-01-01T00:00:00Z) as a unix timestamp
+RIPPLE_EPOCH = 946684800
+# First ledger available on full-history mainnet servers
+FIRST_LEDGER_INDEX = 32570
+
+
+# Call a rippled JSON-RPC method on a full-history server
+# https://xrpl.org/docs/references/http-websocket-apis/api-conventions/request-formatting
+def rippled_request(method, params, url="https://xrplcluster.com", retries=3, delay=5):
+    for attempt in range(retries):
+        try:
+            response = requests.post(url, json={"method": method, "params": [params]})
+
+            # Handle rate limit response
+            if response.status_code in (429, 503):
+                print(f"Rate limit hit for {method}. Retrying in {delay * (attempt+1)} seconds...")
+                time.sleep(delay * (attempt+1))
+                continue
+
+            response.raise_for_status()
+            result = response.json().get("result", {})
+            if result.get("status") == "error":
+                print(f"Error from {method}: {result.get('error')}")
+                time.sleep(delay)
+                continue
+            return result
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error calling {method}: {e}")
+            if attempt < retries - 1:
+                time.sleep(delay)
+
+    print(f"Failed to call {method} after {retries} attempts.")
+    return None
+
+
+def ledger_close_time(ledger_index):
+    result = rippled_request("ledger", {"ledger_index": ledger_index})
+    if result is None:
+        raise RuntimeError(f"Could not fetch ledger {ledger_index}")
+    return result["ledger"]["close_time"] + RIPPLE_EPOCH
+
+
+def first_ledger_after(timestamp, lo=FIRST_LEDGER_INDEX, hi=None):
+    """
+    Binary search the first validated ledger closed at or after a unix `timestamp`.
+    """
+    if hi is None:
+        hi = rippled_request("ledger", {"ledger_index": "validated"})["ledger_index"]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if ledger_close_time(mid) < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def month_ledger_range(month, cache):
+    """
+    Return the [first, last] ledger indexes closed during `month` (YYYY-MM), caching month boundaries.
+    """
+    def boundary(year, mon):
+        key = f"{year:04d}-{mon:02d}"
+        if key not in cache:
+            cache[key] = first_ledger_after(datetime(year, mon, 1, tzinfo=timezone.utc).timestamp())
+        return cache[key]
+
+    year, mon = int(month[:4]), int(month[5:7])
+    next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return boundary(year, mon), boundary(next_year, next_mon) - 1
+
+
+def fetch_ledger_range_transactions(account, ledger_min, ledger_max, limit=200, max_pages=50):
+    """
+    Fetch every transaction of an account validated in [ledger_min, ledger_max], in the xrpscan format.
+    Returns (transactions, exhausted): `exhausted` is True only when the last page came back without a marker.
+    """
+    # https://xrpl.org/docs/references/http-websocket-apis/public-api-methods/account-methods/account_tx
+    transactions = []
+    marker = None
+    for _ in range(max_pages):
+        params = {"account": account, "ledger_index_min": ledger_min, "ledger_index_max": ledger_max,
+                  "limit": limit, "forward": True}
+        if marker:
+            params["marker"] = marker
+        result = rippled_request("account_tx", params)
+        if result is None:
+            return transactions, False  # Failed request
+
+        for entry in result.get("transactions", []):
+            transactions.append(normalize_stream_tx({"transaction": entry["tx"], "meta": entry["meta"]}))
+
+        marker = result.get("marker")
+        if not marker:
+            return transactions, True
+
+    print(f"More than {max_pages} pages for {account} in ledgers {ledger_min}-{ledger_max}.")
+    return transactions, False
+
+
+def reservoir_add(stratum, tx, sample_size, rng):
+    """
+    Add a transaction to a stratum reservoir (Algorithm R), keeping a uniform sample of `sample_size`.
+    """
+    stratum["population"] += 1
+    if len(stratum["transactions"]) < sample_size:
+        stratum["transactions"].append(tx)
+    else:
+        j = rng.randrange(stratum["population"])
+        if j < sample_size:
+            stratum["transactions"][j] = tx
+
+
+def sample_entity_month(accounts, month, ledger_cache, rng, segments=30, sampled_segments=6,
+                        sample_size=10, max_pages=50):
+    """
+    Sample one month of the transactions of an entity.
+    The month's ledger range is split into `segments` equal segments (about a day each), of which
+    `sampled_segments` are drawn at random and fetched completely for every account, through rippled
+    `account_tx` with ledger bounds. Only those segments' pages are downloaded.
+    In each fetched segment, a reservoir of `sample_size` transactions is kept per transaction type.
+    """
+    ledger_min, ledger_max = month_ledger_range(month, ledger_cache)
+    edges = [ledger_min + (ledger_max + 1 - ledger_min) * i // segments for i in range(segments + 1)]
+    chosen = sorted(rng.sample(range(segments), min(sampled_segments, segments)))
+
+    fetched = []
+    complete = True
+    for segment in chosen:
+        seg_min, seg_max = edges[segment], edges[segment + 1] - 1
+        reservoirs = defaultdict(lambda: {"population": 0, "transactions": []})  # {type: reservoir}
+        seen_hashes = set()  # Transfers between accounts of the entity are fetched twice
+        for account in accounts:
+            transactions, exhausted = fetch_ledger_range_transactions(account, seg_min, seg_max, max_pages=max_pages)
+            complete = complete and exhausted
+            for tx in transactions:
+                if tx.get("hash") in seen_hashes:
+                    continue
+                seen_hashes.add(tx.get("hash"))
+                reservoir_add(reservoirs[tx.get("TransactionType", "UNKNOWN")], tx, sample_size, rng)
+        fetched.append({"segment": segment, "ledger_min": seg_min, "ledger_max": seg_max, "reservoirs": reservoirs})
+
+    strata = []
+    for tx_type in sorted({t for seg in fetched for t in seg["reservoirs"]}):
+        # Sampled segments without this type are kept as empty clusters
+        stratum_segments = [
+            {
+                "segment": seg["segment"],
+                "ledger_min": seg["ledger_min"],
+                "ledger_max": seg["ledger_max"],
+                "population": seg["reservoirs"][tx_type]["population"] if tx_type in seg["reservoirs"] else 0,
+                "transactions": seg["reservoirs"][tx_type]["transactions"] if tx_type in seg["reservoirs"] else [],
+            }
+            for seg in fetched
+        ]
+        population = segments / len(fetched) * sum(seg["population"] for seg in stratum_segments)
+        sample = sum(len(seg["transactions"]) for seg in stratum_segments)
+        strata.append({
+            "month": month,
+            "type": tx_type,
+            "segments_total": segments,
+            "segments_sampled": len(fetched),
+            "population": population,  # Estimated from the sampled segments
+            "sample_size": sample,
+            "weight": population / sample,
+            "complete": complete,
+            "segments": stratum_segments,
+        })
+    return strata
+
+
+def sample_entity_transactions(name, accounts, months, segments=30, sampled_segments=6, sample_size=10,
+                               max_pages=50, ledger_cache=None, seed=0):
+    """
+    Build a stratified sample of the transactions of one entity, stratified by month and transaction type.
+    Every month in `months` (YYYY-MM) is fetched directly by ledger range, so old and recent months get the
+    same coverage, and only `sampled_segments` / `segments` of each month's pages are downloaded.
+    Each stratum reports its estimated population and estimator weight (population / sample size).
+    A stratum is flagged `complete: False` when one of its segments could not be fetched entirely
+    (failed request or more than `max_pages` pages), since its population is then undercounted.
+    """
+    rng = random.Random(seed)
+    ledger_cache = {} if ledger_cache is None else ledger_cache
+    strata = []
+    for month in months:
+        print(f"Sampling {month} transactions for {name}...")
+        strata.extend(sample_entity_month(accounts, month, ledger_cache, rng, segments, sampled_segments,
+                                          sample_size, max_pages))
+    return {"name": name, "accounts": accounts, "strata": strata}
+
+
+def fetch_stratified_samples_for_top_accounts(months, top_num=5, segments=30, sampled_segments=6, sample_size=10):
+
+    if not os.path.exists('samples'):
+        os.makedirs('samples')  # Create the directory if it doesn't exist
+
+    well_known_data = fetch_well_known_data()
+    sorted_accounts = group_and_count_accounts(well_known_data)
+    top_names = sorted_accounts[:top_num]
+    ledger_cache = {}  # Month boundaries are shared by all entities
+
+    for entry in top_names:
+        name = entry["name"]
+        sample = sample_entity_transactions(name, entry["accounts"], months, segments=segments,
+                                            sampled_segments=sampled_segments, sample_size=sample_size,
+                                            ledger_cache=ledger_cache)
+
+        output_file = os.path.join('samples', f"{name.replace(' ', '_')}.json")
+        with open(output_file, "w") as f:
+            json.dump(sample, f, indent=4)
+        print(f"Saved {len(sample['strata'])} strata for {name} to {output_file}")
+
+
 if __name__ == "__main__":
     # fetch_all_recent_tx_for_well_known_accounts()
+    # fetch_stratified_samples_for_top_accounts([f"{year}-{month:02d}" for year in (2023, 2024) for month in range(1, 13)])
     fetch_recent_tx_for_top_accounts()
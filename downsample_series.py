@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+
+# pandas resample rule of each rollup resolution, finest first
+ROLLUP_RULES = {"day": "D", "week": "W", "month": "MS"}
+
+
+def to_series(dates, values):
+    """
+    Build a date-indexed Series from parallel lists of dates and values.
+    """
+    return pd.Series(np.asarray(values, dtype=float), index=pd.to_datetime(list(dates))).sort_index()
+
+
+def rollup(series, resolution, how="mean"):
+    """
+    Aggregate a date-indexed series to one point per `resolution` period (intra-day points included).
+    Use how="sum" for counts and how="mean" for ratios; empty periods are dropped.
+    """
+    resampled = series.resample(ROLLUP_RULES[resolution])
+    rolled = resampled.sum(min_count=1) if how == "sum" else getattr(resampled, how)()
+    return rolled.dropna()
+
+
+def build_rollups(series, how="mean"):
+    """
+    Precompute the day, week and month rollups of a date-indexed series.
+    """
+    return {resolution: rollup(series, resolution, how) for resolution in ROLLUP_RULES}
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the `threshold` points of (x, y) that best preserve the shape of the line.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average point of the next bucket (the last point for the final bucket)
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_rollups(rollups, max_points=1000):
+    """
+    Pick the finest precomputed rollup (day, week, month) that fits `max_points`;
+    if even the monthly rollup is above the budget, it is LTTB-downsampled.
+    Returns (dates, values) lists.
+    """
+    for series in rollups.values():
+        if len(series) <= max_points:
+            return list(series.index), list(series.values)
+
+    series = rollups["month"]
+    keep = lttb(series.index.asi8 / 1e9, series.values, max_points)
+    return list(series.index[keep]), list(series.values[keep])
+
+
+def downsample(dates, values, max_points=1000, how="mean"):
+    """
+    Reduce a series to at most `max_points` points for plotting.
+    To render the same series repeatedly, build its rollups once with `build_rollups`
+    and call `downsample_rollups` instead.
+    """
+    return downsample_rollups(build_rollups(to_series(dates, values), how), max_points)
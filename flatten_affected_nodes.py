@@ -0,0 +1,221 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from index_payment_flows import iter_collected_transactions
+
+
+NODE_ACTIONS = {"CreatedNode": "created", "ModifiedNode": "modified", "DeletedNode": "deleted"}
+
+
+def flatten_fields(fields, suffix):
+    """
+    Flatten ledger entry fields into columns ending with `suffix`.
+    Amounts are split into value / currency / issuer columns, XRP drops are converted to XRP.
+    """
+    row = {}
+    for field, value in fields.items():
+        if isinstance(value, dict):
+            if "value" in value:
+                row[f"{field}_value{suffix}"] = float(value["value"])
+            for key in ("currency", "issuer"):
+                if key in value:
+                    row[f"{field}_{key}{suffix}"] = value[key]
+        elif isinstance(value, list):
+            continue
+        elif field in ("Balance", "TakerGets", "TakerPays", "Amount", "Amount2") and isinstance(value, str):
+            row[f"{field}_value{suffix}"] = int(value) / 1_000_000
+            row[f"{field}_currency{suffix}"] = "XRP"
+        else:
+            row[f"{field}{suffix}"] = value
+    return row
+
+
+def node_states(action, node):
+    """
+    Return the (before, after) fields of an affected node.
+    For deleted nodes, `after` is the FinalFields state the entry had when it was removed.
+    """
+    final = node.get("FinalFields", {})
+    previous = node.get("PreviousFields", {})
+    if action == "created":
+        return {}, node.get("NewFields", {})
+    return {**final, **previous}, final
+
+
+def flatten_chunk(transactions):
+    """
+    Flatten the AffectedNodes of a list of transactions into one row list per LedgerEntryType.
+    """
+    rows = defaultdict(list)  # {LedgerEntryType: [row, ...]}
+    for tx in transactions:
+        meta = tx.get("meta", {})
+        for affected in meta.get("AffectedNodes", []):
+            for node_kind, node in affected.items():
+                action = NODE_ACTIONS.get(node_kind)
+                if action is None:
+                    continue
+                before, after = node_states(action, node)
+                row = {
+                    "hash": tx.get("hash"),
+                    "date": tx.get("date"),
+                    "transaction_type": tx.get("TransactionType"),
+                    "result": meta.get("TransactionResult"),
+                    "action": action,
+                    "ledger_index": node.get("LedgerIndex"),
+                    # Fields this transaction actually changed
+                    "changed_fields": ",".join(sorted(node.get("PreviousFields", {}))),
+                }
+                row.update(flatten_fields(before, "_before"))
+                row.update(flatten_fields(after, "_after"))
+                rows[node.get("LedgerEntryType", "UNKNOWN")].append(row)
+    return rows
+
+
+def flatten_affected_nodes(transactions, chunk_size=5000, workers=None):
+    """
+    Turn the metadata of many transactions into columnar node tables, one DataFrame per LedgerEntryType
+    (Offer, AMM, RippleState, ...) with one row per affected node and `_before` / `_after` columns.
+    Transactions are deduplicated by hash and flattened in parallel chunks.
+    """
+    unique = {}
+    for tx in transactions:
+        unique.setdefault(tx.get("hash"), tx)
+    transactions = list(unique.values())
+    chunks = [transactions[i:i + chunk_size] for i in range(0, len(transactions), chunk_size)]
+
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(chunks) <= 1:
+        results = [flatten_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(flatten_chunk, chunks))
+
+    rows = defaultdict(list)
+    for result in results:
+        for entry_type, entry_rows in result.items():
+            rows[entry_type].extend(entry_rows)
+
+    tables = {}
+    for entry_type, entry_rows in rows.items():
+        table = pd.DataFrame(entry_rows)
+        table["date"] = pd.to_datetime(table["date"], format="%Y-%m-%dT%H:%M:%S.%fZ")
+        tables[entry_type] = table
+    return tables
+
+
+def flatten_collected_data(data, chunk_size=5000, workers=None):
+    """
+    Flatten a loaded collected file ({account: [tx, ...]}), as used by `analyze_cost.py` and `analyze_amm_data.py`.
+    """
+    tx_lists = data.values() if isinstance(data, dict) else [data]
+    return flatten_affected_nodes((tx for txs in tx_lists for tx in txs), chunk_size, workers)
+
+
+def current_column(table, field):
+    """
+    The `field` column of each node after the transaction, falling back to its value before it.
+    """
+    after, before = f"{field}_after", f"{field}_before"
+    column = table[after] if after in table else pd.Series(None, index=table.index, dtype=object)
+    return column.fillna(table[before]) if before in table else column
+
+
+def value_change(table, field):
+    """
+    After minus before of an amount field; missing sides (created nodes) count as 0.
+    """
+    before = table.get(f"{field}_value_before", pd.Series(0.0, index=table.index)).fillna(0)
+    after = table.get(f"{field}_value_after", pd.Series(0.0, index=table.index)).fillna(0)
+    return after - before
+
+
+def amm_pool_changes(tables):
+    """
+    Per-transaction changes of AMM pool reserves and LP token supply, one row per (transaction, AMM, asset).
+    AMM ledger entries only hold the LP token balance; the reserves live on the AMM account itself,
+    as its AccountRoot XRP balance and its RippleState trust lines.
+    AMM accounts are recognised by the `AMMID` of their AccountRoot as well as by AMM entries, since a swap
+    routed through a pool only touches the AMM account's AccountRoot and trust lines.
+    """
+    columns = ["hash", "date", "transaction_type", "amm_account", "kind", "currency", "issuer", "change"]
+    changes = []
+    amm_accounts = set()
+
+    amm = tables.get("AMM")
+    if amm is not None:
+        amm = amm.assign(amm_account=current_column(amm, "Account"))
+        amm_accounts |= set(amm["amm_account"].dropna())
+        changes.append(amm.assign(
+            kind="lp_token",
+            currency=current_column(amm, "LPTokenBalance_currency"),
+            issuer=amm["amm_account"],
+            change=value_change(amm, "LPTokenBalance"),
+        )[columns])
+
+    roots = tables.get("AccountRoot")
+    if roots is not None:
+        roots = roots.assign(amm_account=current_column(roots, "Account"))
+        amm_ids = current_column(roots, "AMMID")
+        amm_accounts |= set(roots.loc[amm_ids.notna(), "amm_account"].dropna())
+        roots = roots[roots["amm_account"].isin(amm_accounts)]
+        changes.append(roots.assign(
+            kind="reserve", currency="XRP", issuer=None, change=value_change(roots, "Balance"),
+        )[columns])
+
+    lines = tables.get("RippleState")
+    if lines is not None:
+        low, high = current_column(lines, "LowLimit_issuer"), current_column(lines, "HighLimit_issuer")
+        lines = lines.assign(low=low, high=high)
+        lines = lines[lines["low"].isin(amm_accounts) | lines["high"].isin(amm_accounts)]
+        # The balance is seen from the low account: positive when the low account holds the currency
+        amm_is_low = lines["low"].isin(amm_accounts)
+        sign = amm_is_low.map({True: 1.0, False: -1.0})
+        changes.append(lines.assign(
+            amm_account=lines["low"].where(amm_is_low, lines["high"]),
+            kind="reserve",
+            currency=current_column(lines, "Balance_currency"),
+            issuer=lines["high"].where(amm_is_low, lines["low"]),
+            change=sign * value_change(lines, "Balance"),
+        )[columns])
+
+    if not changes:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(changes, ignore_index=True)
+
+
+def offer_fills(tables):
+    """
+    Amounts taken from order book offers (CLOB liquidity consumed) per transaction.
+    Only offers whose TakerGets / TakerPays changed in the transaction count as filled: cancelled,
+    replaced, expired or unfunded offers are deleted without PreviousFields and get `filled` False.
+    The remaining amount of a deleted offer is its FinalFields amount.
+    """
+    offers = tables.get("Offer")
+    if offers is None:
+        return pd.DataFrame()
+    offers = offers[offers["action"] != "created"].copy()
+    changed = offers["changed_fields"].fillna("").str.split(",")
+    offers["filled"] = changed.apply(lambda fields: "TakerGets" in fields or "TakerPays" in fields)
+    for field in ("TakerGets", "TakerPays"):
+        fill = value_change(offers, field) * -1
+        offers[f"{field}_filled"] = fill.where(offers["filled"], 0.0)
+    return offers
+
+
+def main():
+    tables = flatten_affected_nodes(iter_collected_transactions("transactions"))
+    for entry_type, table in tables.items():
+        print(f"{entry_type}: {len(table)} nodes, {len(table.columns)} columns")
+        file_name = f"affected_nodes_{entry_type}.csv"
+        table.to_csv(file_name, index=False)
+        print(f"Saved {entry_type} nodes to {file_name}")
+
+    print(amm_pool_changes(tables).head())
+    print(offer_fills(tables).head())
+
+
+if __name__ == "__main__":
+    main()
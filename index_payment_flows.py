@@ -0,0 +1,259 @@
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+
+
+# Number of leading characters of the ISO date kept for each bucket size
+BUCKET_PREFIX = {"year": 4, "month": 7, "day": 10}
+
+
+def load_json(file_name):
+    if not os.path.exists(file_name):
+        print(f"File {file_name} not found!")
+        raise FileNotFoundError
+    with open(file_name, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_collected_transactions(data_dir="transactions"):
+    """
+    Yield every transaction stored in the collected `.json` files.
+    Supports both the per-name files ({account: [tx, ...]}) and the per-account files ([tx, ...]).
+    """
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        data = load_json(os.path.join(data_dir, file_name))
+        tx_lists = data.values() if isinstance(data, dict) else [data]
+        for transactions in tx_lists:
+            for tx in transactions:
+                yield tx
+
+
+def parse_amount(amount):
+    """
+    Return (value, currency, issuer) for an amount given either as XRP drops or as an issued currency object.
+    XRP has no issuer.
+    """
+    if amount is None:
+        return 0.0, "UNKNOWN", None
+    if isinstance(amount, dict):
+        return float(amount.get("value", 0)), amount.get("currency", "UNKNOWN"), amount.get("issuer")
+    return float(amount) / 1_000_000, "XRP", None
+
+
+def build_flow_graph(transactions, currency, issuer=None, bucket="month"):
+    """
+    Build a CSR Account -> Destination graph of the Payment transactions of one asset.
+    Edges are keyed by (account, time bucket, destination) and carry volume, count and failures.
+    Volume is the delivered amount, so only payments in `currency` issued by `issuer`
+    (None for XRP) are kept and amounts of different assets are never summed together.
+    """
+    prefix = BUCKET_PREFIX[bucket]
+    account_ids = {}
+    bucket_ids = {}
+    edges = defaultdict(lambda: [0.0, 0, 0])  # {(src, bucket, dst): [volume, count, failures]}
+    seen_hashes = set()
+
+    for tx in transactions:
+        if tx.get("TransactionType") != "Payment":
+            continue
+        # The same payment is collected once per well-known account it involves
+        tx_hash = tx.get("hash")
+        if tx_hash in seen_hashes:
+            continue
+        seen_hashes.add(tx_hash)
+
+        meta = tx.get("meta", {})
+        succeeded = meta.get("TransactionResult") == "tesSUCCESS"
+        value, tx_currency, tx_issuer = parse_amount(meta.get("delivered_amount") if succeeded else tx.get("Amount"))
+        if tx_currency != currency or tx_issuer != issuer:
+            continue
+
+        src = account_ids.setdefault(tx.get("Account"), len(account_ids))
+        dst = account_ids.setdefault(tx.get("Destination"), len(account_ids))
+        b = bucket_ids.setdefault(tx["date"][:prefix], len(bucket_ids))
+
+        edge = edges[(src, b, dst)]
+        edge[1] += 1
+        if succeeded:
+            edge[0] += value
+        else:
+            edge[2] += 1
+
+    graph = compress_edges(edges, account_ids, bucket_ids, bucket)
+    graph["currency"] = np.array(currency, dtype=object)
+    graph["issuer"] = np.array(issuer, dtype=object)
+    graph["index"] = account_index(graph)
+    return graph
+
+
+def compress_edges(edges, account_ids, bucket_ids, bucket):
+    """
+    Turn the {(src, bucket, dst): [volume, count, failures]} edge map into CSR arrays sorted by source.
+    Bucket ids are renumbered so that they follow chronological order.
+    """
+    accounts = sorted(account_ids, key=account_ids.get)
+    buckets = sorted(bucket_ids)
+    bucket_order = np.empty(len(bucket_ids), dtype=np.int32)
+    for position, label in enumerate(buckets):
+        bucket_order[bucket_ids[label]] = position
+
+    keys = np.array(list(edges.keys()), dtype=np.int64).reshape(-1, 3)
+    weights = np.array(list(edges.values()), dtype=np.float64).reshape(-1, 3)
+    src, edge_bucket, dst = keys[:, 0], bucket_order[keys[:, 1]], keys[:, 2]
+
+    # Sort by source, then destination, then bucket
+    order = np.lexsort((edge_bucket, dst, src))
+    indptr = np.zeros(len(accounts) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(accounts)), out=indptr[1:])
+
+    return {
+        "bucket": bucket,
+        "accounts": np.array(accounts, dtype=object),
+        "buckets": np.array(buckets, dtype=object),
+        "indptr": indptr,
+        "indices": dst[order].astype(np.int32),
+        "bucket_ids": edge_bucket[order].astype(np.int32),
+        "volume": weights[order, 0],
+        "count": weights[order, 1].astype(np.int64),
+        "failures": weights[order, 2].astype(np.int64),
+    }
+
+
+def save_flow_graph(graph, file_name="payment_flows.npz"):
+    # The account index is rebuilt at load time
+    np.savez_compressed(file_name, **{key: value for key, value in graph.items() if key != "index"})
+    print(f"Saved flow graph to {file_name}")
+
+
+def load_flow_graph(file_name="payment_flows.npz"):
+    with np.load(file_name, allow_pickle=True) as f:
+        graph = {key: f[key] for key in f.files}
+    graph["bucket"] = str(graph["bucket"])
+    graph["currency"] = graph["currency"].item()
+    graph["issuer"] = graph["issuer"].item()
+    graph["index"] = account_index(graph)
+    return graph
+
+
+def account_index(graph):
+    """
+    Map each account address to its row in the graph.
+    Built once when the graph is built or loaded and kept under graph["index"].
+    """
+    return {account: i for i, account in enumerate(graph["accounts"])}
+
+
+def bucket_mask(graph, start=None, end=None, bucket_ids=None):
+    """
+    Boolean mask over the edges (all of them, or the given `bucket_ids` slice) whose bucket label lies in [start, end].
+    """
+    labels = graph["buckets"]
+    selected = np.ones(len(labels), dtype=bool)
+    if start is not None:
+        selected &= labels >= start
+    if end is not None:
+        selected &= labels <= end
+    return selected[graph["bucket_ids"] if bucket_ids is None else bucket_ids]
+
+
+def neighbors(graph, account, start=None, end=None):
+    """
+    Aggregate the outgoing flows of one account per destination over the selected buckets.
+    """
+    row = graph["index"].get(account)
+    if row is None:
+        return []
+    lo, hi = graph["indptr"][row], graph["indptr"][row + 1]
+    mask = bucket_mask(graph, start, end, graph["bucket_ids"][lo:hi])
+    dst = graph["indices"][lo:hi][mask]
+
+    unique_dst, inverse = np.unique(dst, return_inverse=True)
+    volume = np.bincount(inverse, weights=graph["volume"][lo:hi][mask], minlength=len(unique_dst))
+    count = np.bincount(inverse, weights=graph["count"][lo:hi][mask], minlength=len(unique_dst))
+    failures = np.bincount(inverse, weights=graph["failures"][lo:hi][mask], minlength=len(unique_dst))
+
+    result = [
+        {"destination": graph["accounts"][d], "volume": v, "count": int(c), "failures": int(fl)}
+        for d, v, c, fl in zip(unique_dst, volume, count, failures)
+    ]
+    return sorted(result, key=lambda x: x["volume"], reverse=True)
+
+
+def top_flows(graph, n=10, weight="volume", start=None, end=None):
+    """
+    Return the `n` heaviest Account -> Destination pairs over the selected buckets.
+    """
+    mask = bucket_mask(graph, start, end)
+    src = np.repeat(np.arange(len(graph["accounts"])), np.diff(graph["indptr"]))[mask]
+    dst = graph["indices"][mask].astype(np.int64)
+
+    pairs, inverse = np.unique(src * len(graph["accounts"]) + dst, return_inverse=True)
+    totals = np.bincount(inverse, weights=graph[weight][mask], minlength=len(pairs))
+    top = np.argsort(totals)[::-1][:n]
+
+    return [
+        {
+            "account": graph["accounts"][pairs[i] // len(graph["accounts"])],
+            "destination": graph["accounts"][pairs[i] % len(graph["accounts"])],
+            weight: totals[i],
+        }
+        for i in top
+    ]
+
+
+def entity_flows(graph, source_accounts, destination_accounts):
+    """
+    Sum the flows from one group of accounts to another (e.g. an exchange to an AMM) per bucket.
+    """
+    index = graph["index"]
+    src_rows = [index[a] for a in source_accounts if a in index]
+    dst_rows = np.array([index[a] for a in destination_accounts if a in index], dtype=np.int32)
+
+    num_buckets = len(graph["buckets"])
+    volume = np.zeros(num_buckets)
+    count = np.zeros(num_buckets)
+    failures = np.zeros(num_buckets)
+    for row in src_rows:
+        lo, hi = graph["indptr"][row], graph["indptr"][row + 1]
+        mask = np.isin(graph["indices"][lo:hi], dst_rows)
+        b = graph["bucket_ids"][lo:hi][mask]
+        volume += np.bincount(b, weights=graph["volume"][lo:hi][mask], minlength=num_buckets)
+        count += np.bincount(b, weights=graph["count"][lo:hi][mask], minlength=num_buckets)
+        failures += np.bincount(b, weights=graph["failures"][lo:hi][mask], minlength=num_buckets)
+
+    return {
+        label: {"volume": volume[i], "count": int(count[i]), "failures": int(failures[i])}
+        for i, label in enumerate(graph["buckets"])
+        if count[i] > 0
+    }
+
+
+def entity_accounts(sorted_accounts_file="sorted_well_known_accounts.json"):
+    """
+    Map each well-known name to its accounts, as produced by `group_well_known_accounts.py`.
+    """
+    return {entry["name"]: entry["accounts"] for entry in load_json(sorted_accounts_file)}
+
+
+def main():
+    graph = build_flow_graph(iter_collected_transactions("transactions"), "XRP", bucket="month")
+    save_flow_graph(graph)
+    print(f"Indexed {len(graph['volume'])} edges between {len(graph['accounts'])} accounts")
+
+    for flow in top_flows(graph, n=10):
+        print(flow)
+
+    entities = entity_accounts()
+    names = list(entities)[:2]
+    if len(names) == 2:
+        print(f"Flows from {names[0]} to {names[1]}:")
+        for month, stats in entity_flows(graph, entities[names[0]], entities[names[1]]).items():
+            print(month, stats)
+
+
+if __name__ == "__main__":
+    main()
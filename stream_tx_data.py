@@ -0,0 +1,367 @@
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from analyze_cost import payment_cost
+from index_payment_flows import iter_collected_transactions
+
+
+# Ripple epoch (2000-01-01T00:00:00Z) as a unix timestamp
+RIPPLE_EPOCH = 946684800
+
+
+def load_json(file_name):
+    if not os.path.exists(file_name):
+        print(f"File {file_name} not found!")
+        raise FileNotFoundError
+    with open(file_name, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Transaction sources. Each one yields transactions in the same format as the collected `.json` files.
+
+def replay_source(data_dir="transactions", delay=0):
+    """
+    Replay the collected transactions in chronological order, optionally sleeping `delay` seconds between them.
+    """
+    for tx in sorted(iter_collected_transactions(data_dir), key=lambda x: x["date"]):
+        yield tx
+        if delay:
+            time.sleep(delay)
+
+
+# GET /api/v1/account/{ACCOUNT}/transactions
+# https://docs.xrpscan.com/api-documentation/account/transactions
+def poll_source(accounts, interval=30, limit=25, max_pages=100):
+    """
+    Poll the new transactions of each account every `interval` seconds.
+    Pages are followed with `marker` until a transaction of the previous poll is reached,
+    so bursts larger than one page are not dropped. The first poll only takes the newest page.
+    """
+    last_seen = {}  # {account: hashes of the newest page of the previous poll}
+    while True:
+        for account in accounts:
+            new_transactions = poll_new_transactions(account, last_seen.get(account), limit, max_pages)
+            if new_transactions is None:
+                continue  # Retried from the same point on the next poll
+            if new_transactions:
+                last_seen[account] = {tx.get("hash") for tx in new_transactions[:limit]}
+            for tx in reversed(new_transactions):
+                yield tx
+        time.sleep(interval)
+
+
+def poll_new_transactions(account, seen, limit=25, max_pages=100):
+    """
+    Fetch the transactions of an account newer than the `seen` hashes, newest first.
+    Returns None if a request failed.
+    """
+    url = f"https://api.xrpscan.com/api/v1/account/{account}/transactions"
+    new_transactions = []
+    marker = None
+    for _ in range(max_pages):
+        params = {"limit": limit}
+        if marker:
+            params["marker"] = marker
+        try:
+            response = requests.get(url, params=params)
+            if response.status_code == 429:
+                print(f"Rate limit hit for {account}. Retrying on next poll...")
+                return None
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error polling transactions for {account}: {e}")
+            return None
+
+        data = response.json()
+        for tx in data.get("transactions", []):
+            if seen is not None and tx.get("hash") in seen:
+                return new_transactions
+            new_transactions.append(tx)
+
+        marker = data.get("marker")
+        if seen is None or not marker:
+            return new_transactions
+
+    print(f"More than {max_pages} pages of new transactions for {account}, older ones are skipped.")
+    return new_transactions
+
+
+def normalize_stream_tx(message):
+    """
+    Convert a rippled `transactions` stream message into the xrpscan transaction format.
+    """
+    tx = dict(message["transaction"])
+    tx["meta"] = dict(message.get("meta", {}))
+    tx["date"] = datetime.fromtimestamp(tx["date"] + RIPPLE_EPOCH, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    if isinstance(tx.get("Amount"), str):
+        tx["Amount"] = {"currency": "XRP", "value": str(int(tx["Amount"]) / 1_000_000)}
+    if isinstance(tx["meta"].get("delivered_amount"), str):
+        drops = tx["meta"]["delivered_amount"]
+        tx["meta"]["delivered_amount"] = {"currency": "XRP", "value": str(int(drops) / 1_000_000)}
+    return tx
+
+
+# https://xrpl.org/docs/references/http-websocket-apis/public-api-methods/subscription-methods/subscribe
+def websocket_source(url="wss://xrplcluster.com", accounts=None, retry_delay=5, max_retry_delay=300):
+    """
+    Subscribe to validated transactions of the given accounts (or of the whole ledger when None).
+    A dropped connection is reopened and resubscribed, waiting `retry_delay` seconds and doubling
+    up to `max_retry_delay` while it keeps failing. Transactions validated while disconnected are not replayed.
+    Requires the `websocket-client` package.
+    """
+    import websocket
+
+    request = {"command": "subscribe"}
+    if accounts:
+        request["accounts"] = list(accounts)
+    else:
+        request["streams"] = ["transactions"]
+
+    delay = retry_delay
+    while True:
+        ws = None
+        try:
+            ws = websocket.create_connection(url)
+            ws.send(json.dumps(request))
+            delay = retry_delay
+            while True:
+                message = json.loads(ws.recv())
+                if message.get("type") == "transaction" and message.get("validated"):
+                    yield normalize_stream_tx(message)
+        except (websocket.WebSocketException, OSError, ValueError) as e:
+            print(f"Websocket connection to {url} lost: {e}. Reconnecting in {delay} seconds...")
+            time.sleep(delay)
+            delay = min(delay * 2, max_retry_delay)
+        finally:
+            if ws is not None:
+                ws.close()
+
+
+# Incremental metrics
+
+def new_live_metrics(account_to_entity=None, dedup_days=2):
+    """
+    Create empty running aggregates.
+    `payment_stats` / `offercreate_stats` have the shape used by `analyze_amm_data.py`,
+    `monthly_totals` the shape used by `analyze_metrics.py`.
+    Hashes are only remembered for the last `dedup_days` days, so memory stays bounded.
+    """
+    return {
+        "account_to_entity": account_to_entity or {},
+        "dedup_days": dedup_days,
+        "latest_day": None,
+        "seen_hashes": defaultdict(set),  # {date: hashes}
+        "dropped": {"duplicate": 0, "late": 0},
+        "payment_stats": defaultdict(lambda: {'total': 0, 'success': 0}),
+        "offercreate_stats": defaultdict(lambda: {'total': 0, 'success': 0}),
+        "payment_errors": defaultdict(lambda: {'tecPATH_PARTIAL': 0, 'tecPATH_DRY': 0}),
+        "monthly_totals": defaultdict(lambda: defaultdict(int)),
+        # {entity: {YYYY-MM: running sums}}
+        "entity_costs": defaultdict(lambda: defaultdict(
+            lambda: {"fee": 0, "slippage_cost_pct": 0.0, "total_cost_currency": 0.0, "transaction_count": 0})),
+    }
+
+
+def update_metrics(metrics, tx):
+    """
+    Fold one transaction into the running aggregates in O(1).
+    Returns "new" when it was counted, "duplicate" when it was already counted,
+    or "late" when it is older than the deduplication window and cannot be checked.
+    """
+    day = datetime.strptime(tx['date'], "%Y-%m-%dT%H:%M:%S.%fZ").date()
+    status = mark_seen(metrics, tx.get("hash"), day)
+    if status != "new":
+        metrics["dropped"][status] += 1
+        return status
+
+    tx_type = tx.get("TransactionType", '')
+    result = tx.get('meta', {}).get('TransactionResult', '')
+    month = tx['date'][:7]
+
+    monthly = metrics["monthly_totals"][month]
+    monthly["transaction_count"] += 1
+    monthly[result] += 1
+
+    if tx_type == 'Payment':
+        stats = metrics["payment_stats"][day]
+        stats['total'] += 1
+        if result == 'tesSUCCESS':
+            stats['success'] += 1
+        errors = metrics["payment_errors"][day]
+        if result in errors:
+            errors[result] += 1
+        stats['tecPATH_PARTIAL_ratio'] = errors['tecPATH_PARTIAL'] / stats['total']
+        stats['tecPATH_DRY_ratio'] = errors['tecPATH_DRY'] / stats['total']
+        update_entity_costs(metrics, tx, month)
+    elif tx_type == 'OfferCreate':
+        stats = metrics["offercreate_stats"][day]
+        stats['total'] += 1
+        if result == 'tesSUCCESS':
+            stats['success'] += 1
+
+    return "new"
+
+
+def mark_seen(metrics, tx_hash, day):
+    """
+    Record a transaction hash under its day and forget the days that left the deduplication window.
+    Returns "duplicate", "late" (too old to be checked against the window) or "new".
+    """
+    seen_hashes = metrics["seen_hashes"]
+    latest_day = metrics["latest_day"]
+    window = timedelta(days=metrics["dedup_days"])
+    if latest_day is not None and day < latest_day - window:
+        return "late"
+    if tx_hash in seen_hashes[day]:
+        return "duplicate"
+    seen_hashes[day].add(tx_hash)
+
+    if latest_day is None or day > latest_day:
+        metrics["latest_day"] = day
+        for old_day in [d for d in seen_hashes if d < day - window]:
+            del seen_hashes[old_day]
+    return "new"
+
+
+def update_entity_costs(metrics, tx, month):
+    """
+    Add the cost of a Payment to the running sums of every well-known entity involved.
+    """
+    entities = {metrics["account_to_entity"].get(tx.get(key)) for key in ("Account", "Destination")}
+    entities.discard(None)
+    if not entities:
+        return
+    cost = payment_cost(tx)
+    for entity in entities:
+        sums = metrics["entity_costs"][entity][month]
+        sums["fee"] += cost["fee"]
+        sums["slippage_cost_pct"] += cost["slippage_cost_pct"]
+        sums["total_cost_currency"] += cost["total_cost_currency"]
+        sums["transaction_count"] += 1
+
+
+def entity_monthly_metrics(metrics, entity):
+    """
+    Monthly averages of one entity, with the columns of `analyze_cost.group_by_month_and_calculate_metrics`.
+    """
+    rows = []
+    for month, sums in sorted(metrics["entity_costs"][entity].items()):
+        count = sums["transaction_count"]
+        rows.append({
+            "month": month,
+            "avg_fee": sums["fee"] / count,
+            "avg_slippage_pct": sums["slippage_cost_pct"] / count,
+            "avg_total_cost": sums["total_cost_currency"] / count,
+            "transaction_count": count,
+        })
+    return rows
+
+
+def snapshot(metrics):
+    """
+    JSON-serializable copy of the current aggregates.
+    `state` holds what `restore_metrics` needs to resume counting after a restart.
+    """
+    return {
+        "payment_stats": {str(d): stats for d, stats in sorted(metrics["payment_stats"].items())},
+        "offercreate_stats": {str(d): stats for d, stats in sorted(metrics["offercreate_stats"].items())},
+        "monthly_totals": {m: dict(totals) for m, totals in sorted(metrics["monthly_totals"].items())},
+        "entity_costs": {entity: entity_monthly_metrics(metrics, entity) for entity in metrics["entity_costs"]},
+        "dropped": dict(metrics["dropped"]),
+        "state": {
+            "dedup_days": metrics["dedup_days"],
+            "latest_day": str(metrics["latest_day"]) if metrics["latest_day"] else None,
+            "seen_hashes": {str(d): sorted(hashes) for d, hashes in metrics["seen_hashes"].items()},
+            "payment_errors": {str(d): errors for d, errors in metrics["payment_errors"].items()},
+            "entity_cost_sums": {entity: {m: sums for m, sums in months.items()}
+                                 for entity, months in metrics["entity_costs"].items()},
+        },
+    }
+
+
+def restore_metrics(saved, account_to_entity=None):
+    """
+    Rebuild the running aggregates from a saved snapshot.
+    """
+    def to_date(day):
+        return datetime.strptime(day, "%Y-%m-%d").date()
+
+    state = saved["state"]
+    metrics = new_live_metrics(account_to_entity, state["dedup_days"])
+    metrics["latest_day"] = to_date(state["latest_day"]) if state["latest_day"] else None
+    metrics["dropped"].update(saved.get("dropped", {}))
+    for day, hashes in state["seen_hashes"].items():
+        metrics["seen_hashes"][to_date(day)] = set(hashes)
+    for day, errors in state["payment_errors"].items():
+        metrics["payment_errors"][to_date(day)] = errors
+    for day, stats in saved["payment_stats"].items():
+        metrics["payment_stats"][to_date(day)] = stats
+    for day, stats in saved["offercreate_stats"].items():
+        metrics["offercreate_stats"][to_date(day)] = stats
+    for month, totals in saved["monthly_totals"].items():
+        metrics["monthly_totals"][month].update(totals)
+    for entity, months in state["entity_cost_sums"].items():
+        for month, sums in months.items():
+            metrics["entity_costs"][entity][month] = sums
+    return metrics
+
+
+def run(source, metrics, output_file="live_metrics.json", save_every=1000):
+    """
+    Consume a transaction source, saving a snapshot of the aggregates every `save_every` new transactions
+    and once more when the source stops, even on an error.
+    Transactions arriving after the deduplication window are not counted and are logged.
+    """
+    processed = 0
+    try:
+        for tx in source:
+            status = update_metrics(metrics, tx)
+            if status == "late":
+                print(f"Dropped late transaction {tx.get('hash')} from {tx.get('date')} "
+                      f"({metrics['dropped']['late']} late so far)")
+            if status != "new":
+                continue
+            processed += 1
+            if processed % save_every == 0:
+                save_snapshot(metrics, output_file)
+                print(f"Processed {processed} transactions")
+    finally:
+        save_snapshot(metrics, output_file)
+        print(f"Processed {processed} transactions, dropped {metrics['dropped']['duplicate']} duplicates "
+              f"and {metrics['dropped']['late']} late transactions")
+
+
+def save_snapshot(metrics, output_file):
+    # Write then rename, so an interrupted save never leaves a truncated snapshot
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(snapshot(metrics), f, indent=4)
+    os.replace(tmp_file, output_file)
+
+
+def main(mode="replay", output_file="live_metrics.json"):
+    sorted_accounts = load_json("sorted_well_known_accounts.json")
+    account_to_entity = {account: entry["name"] for entry in sorted_accounts for account in entry["accounts"]}
+    if os.path.exists(output_file):
+        print(f"Resuming from {output_file}")
+        metrics = restore_metrics(load_json(output_file), account_to_entity)
+    else:
+        metrics = new_live_metrics(account_to_entity)
+
+    if mode == "replay":
+        source = replay_source("transactions")
+    elif mode == "poll":
+        source = poll_source(list(account_to_entity))
+    else:
+        source = websocket_source(accounts=list(account_to_entity))
+
+    run(source, metrics, output_file)
+
+
+if __name__ == "__main__":
+    main()